@@ -3,49 +3,149 @@
 import os
 import sys
 import argparse
-from pathlib import Path
+import mmap
+from concurrent.futures import ThreadPoolExecutor
+
+# How many upcoming input files to ask the kernel to prefetch
+PREFETCH_DEPTH = 8
+
+# Body bytes per gathering writev call
+WRITEV_CHUNK = 2 << 20
+
+def _prefetch(file_path):
+    """Hint the kernel to start reading file_path into the page cache"""
+    try:
+        fd = os.open(file_path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        finally:
+            os.close(fd)
+    except OSError:
+        pass
+
+def _writev_all(out_fd, header, body):
+    """
+    Emit header + body with gathering writev calls, WRITEV_CHUNK of body at
+    a time. The header rides in the first call's iovec, so it never costs
+    its own syscall or a concatenated copy; short writes just leave the
+    remainder for the next iteration.
+    """
+    hdr = memoryview(header)
+    pos = 0
+    body_len = len(body)
+    while hdr.nbytes or pos < body_len:
+        chunk = body[pos:pos + WRITEV_CHUNK]
+        if hdr.nbytes:
+            written = os.writev(out_fd, [hdr, chunk])
+            consumed = min(written, hdr.nbytes)
+            hdr = hdr[consumed:]
+            pos += written - consumed
+        else:
+            pos += os.writev(out_fd, [chunk])
+
+def _write_all(outfile, data):
+    """Write all of data to the unbuffered output, looping on short writes"""
+    view = memoryview(data)
+    while view:
+        n = outfile.write(view)
+        view = view[n:]
+
+def _copy_file(infile, outfile, buf):
+    """Copy infile to outfile, in-kernel via sendfile when the platform has it.
+
+    buf is a caller-owned bytearray reused via readinto for the fallback
+    path, so copying N files touches one buffer instead of allocating a
+    bytes object per read.
+    """
+    if hasattr(os, 'sendfile'):
+        outfile.flush()
+        out_fd = outfile.fileno()
+        in_fd = infile.fileno()
+        offset = 0
+        remaining = os.fstat(in_fd).st_size
+        while remaining > 0:
+            sent = os.sendfile(out_fd, in_fd, offset, remaining)
+            if sent == 0:
+                break
+            offset += sent
+            remaining -= sent
+    else:
+        mv = memoryview(buf)
+        while (n := infile.readinto(buf)):
+            _write_all(outfile, mv[:n])
 
 def concat_files(input_dir, output_file, delimiter):
     """
     Concatenate all text files in input_dir into output_file,
     with delimiter and filename annotations between files.
     """
-    # Get list of all .txt files in the directory
-    input_path = Path(input_dir)
-    text_files = list(input_path.glob('*.txt'))
-    
-    # If no text files found, check for any file (without extension filtering)
+    # Get list of all .txt files in the directory. scandir's is_file() reads
+    # the d_type already returned by getdents64, so this costs no stat()
+    # syscalls and no Path objects per entry.
+    with os.scandir(input_dir) as it:
+        entries = [e for e in it if e.is_file(follow_symlinks=False)]
+    text_files = [e.path for e in entries if e.name.endswith('.txt')]
+
+    # If no text files found, fall back to every regular file
     if not text_files:
-        text_files = [f for f in input_path.iterdir() if f.is_file()]
-    
+        text_files = [e.path for e in entries]
+
     if not text_files:
         print(f"No files found in {input_dir}")
         return
     
-    # Open output file
-    with open(output_file, 'w', encoding='utf-8') as outfile:
+    # Encode the delimiter once; headers are assembled from pre-encoded
+    # pieces instead of formatting and encoding an f-string per file.
+    # File contents are copied through as raw bytes, so nothing is ever
+    # decoded or re-encoded and there is no encoding to get wrong.
+    delim_b = delimiter.encode('utf-8')
+
+    # One 1 MiB scratch buffer shared across every file copy
+    buf = bytearray(1<<20)
+
+    # Reads are parallel, writes are ordered: a small pool issues WILLNEED
+    # fadvise hints a few files ahead so the kernel fills the page cache
+    # while the main thread writes the current file. Each file is emitted
+    # as one gathering writev of header + mmapped body, so the output fd is
+    # opened unbuffered (there is nothing left to coalesce).
+    can_gather = hasattr(os, 'writev')
+    can_prefetch = hasattr(os, 'posix_fadvise')
+
+    with ThreadPoolExecutor(max_workers=2) as pool, \
+         open(output_file, 'wb', buffering=0) as outfile:
+        out_fd = outfile.fileno()
+        prefetched = 0
+
         # Process each file
         for i, file_path in enumerate(text_files):
+            # Keep the prefetch window PREFETCH_DEPTH files ahead
+            if can_prefetch:
+                while prefetched < min(i + 1 + PREFETCH_DEPTH, len(text_files)):
+                    pool.submit(_prefetch, text_files[prefetched])
+                    prefetched += 1
+
+            file_name = os.path.basename(file_path)
+
             # Add delimiter before file content (except for first file)
+            header = delim_b + b" File: " + os.fsencode(file_name) + b" " + delim_b + b"\n\n"
             if i > 0:
-                outfile.write(f"\n{delimiter} File: {file_path.name} {delimiter}\n\n")
-            else:
-                outfile.write(f"{delimiter} File: {file_path.name} {delimiter}\n\n")
-            
-            # Read and write the file content
-            try:
-                with open(file_path, 'r', encoding='utf-8') as infile:
-                    outfile.write(infile.read())
-            except UnicodeDecodeError:
-                # Try with a different encoding if UTF-8 fails
-                try:
-                    with open(file_path, 'r', encoding='latin-1') as infile:
-                        outfile.write(infile.read())
-                except Exception as e:
-                    outfile.write(f"\nError reading file {file_path.name}: {str(e)}\n")
-            except Exception as e:
-                outfile.write(f"\nError reading file {file_path.name}: {str(e)}\n")
-    
+                header = b"\n" + header
+
+            with open(file_path, 'rb') as infile:
+                size = os.fstat(infile.fileno()).st_size
+                if can_gather and size > 0:
+                    with mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        # One linear pass per input: widen readahead and
+                        # pre-fault the mapping before the gathering write
+                        if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                            mm.madvise(mmap.MADV_SEQUENTIAL)
+                            mm.madvise(mmap.MADV_WILLNEED)
+                        _writev_all(out_fd, header, memoryview(mm))
+                else:
+                    # Empty file, or no writev on this platform
+                    _write_all(outfile, header)
+                    _copy_file(infile, outfile, buf)
+
     print(f"Successfully concatenated {len(text_files)} files into {output_file}")
 
 def main():
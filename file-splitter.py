@@ -1,45 +1,224 @@
 #!/usr/bin/env python3
 
 import os
+import re
 import sys
 import argparse
+import mmap
 from pathlib import Path
-import math
 
 def get_file_size(file_path):
     """Get file size in bytes"""
     return os.path.getsize(file_path)
 
+_SIZE_RE = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*(B|KB|MB|GB)?\s*$', re.IGNORECASE)
+_SIZE_MULTIPLIERS = {None: 1, 'B': 1, 'KB': 1024, 'MB': 1<<20, 'GB': 1<<30}
+
 def convert_size_to_bytes(size_str):
-    """Convert human-readable size to bytes"""
-    size_str = size_str.upper()
-    units = {'B': 1, 'KB': 1024, 'MB': 1024*1024, 'GB': 1024*1024*1024}
-    
-    for unit, multiplier in units.items():
-        if size_str.endswith(unit):
-            try:
-                size = float(size_str[:-len(unit)]) * multiplier
-                return int(size)
-            except ValueError:
-                pass
-    
-    # If no unit specified, assume bytes
-    try:
-        return int(float(size_str))
-    except ValueError:
+    """Convert human-readable size (e.g. "10MB", "500KB", "1024") to bytes"""
+    match = _SIZE_RE.match(size_str)
+    if not match:
         raise ValueError(f"Invalid size format: {size_str}")
 
+    unit = match.group(2)
+    return int(float(match.group(1)) * _SIZE_MULTIPLIERS[unit and unit.upper()])
+
+_SIZE_UNITS = ('B', 'KB', 'MB', 'GB')
+
 def human_readable_size(size_in_bytes):
     """Convert bytes to human-readable size"""
-    for unit in ['B', 'KB', 'MB', 'GB']:
-        if size_in_bytes < 1024 or unit == 'GB':
-            return f"{size_in_bytes:.2f}{unit}"
-        size_in_bytes /= 1024
+    # bit_length picks the unit directly (each unit step is 10 bits)
+    unit = min(max((int(size_in_bytes).bit_length() - 1) // 10, 0), len(_SIZE_UNITS) - 1)
+    return f"{size_in_bytes / (1 << (10 * unit)):.2f}{_SIZE_UNITS[unit]}"
+
+def plan_parts(data, batch_size):
+    """
+    Compute the (start, end) byte range of every output part over data,
+    cutting at paragraph boundaries (b'\\n\\n').
+
+    Instead of visiting every boundary, jump a whole batch_size ahead and
+    locate just the one that closes the batch: the last b'\\n\\n' inside the
+    window keeps the part at or under batch_size, and a single paragraph
+    longer than batch_size falls through to the next boundary after it.
+    One or two memchr-backed find calls per part replaces a scan over every
+    separator in the file. Ranges are yielded as they are found so callers
+    can write each part without materializing the whole plan. Kept free of
+    I/O and self-contained so it can be AOT-compiled (Cython/mypyc)
+    wholesale if the interpreter loop ever shows up in a profile.
+    """
+    pos = 0
+    data_len = len(data)
+    while pos < data_len:
+        target = pos + batch_size
+        if target >= data_len:
+            end = data_len
+        else:
+            end = data.rfind(b'\n\n', pos, target + 2)
+            if end <= pos:
+                # No boundary inside the window: take the oversized
+                # paragraph whole, up to the next boundary or EOF
+                end = data.find(b'\n\n', target)
+                if end == -1:
+                    end = data_len
+        yield (pos, end)
+        pos = end + 2
+
+def write_part(output_file, data):
+    """Write one part's bytes, reserving the extent up front as write_parts does"""
+    fd = os.open(output_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        if hasattr(os, 'posix_fallocate') and data:
+            os.posix_fallocate(fd, 0, len(data))
+        part = memoryview(data)
+        while part:
+            n = os.write(fd, part)
+            part = part[n:]
+    finally:
+        os.close(fd)
+
+def split_file_streaming(input_path, batch_size, output_dir, output_prefix):
+    """
+    Split with a rolling window of at most ~batch_size bytes instead of a
+    mapping, so memory stays constant no matter how large the input is
+    (mmap address space can be the limit on 32-bit or for >RAM files with
+    random page reuse). Same boundary rules as plan_parts: cut at the last
+    b'\\n\\n' within the window, and let a paragraph longer than batch_size
+    run on to its closing boundary.
+    """
+    current_part = 1
+    window = bytearray()
+    eof = False
+
+    with open(input_path, 'rb', buffering=1<<20) as infile:
+        while True:
+            # Top up the window to batch_size + 2 bytes so a boundary
+            # sitting exactly at batch_size is still visible
+            if not eof and len(window) < batch_size + 2:
+                need = batch_size + 2 - len(window)
+                chunk = infile.read(need)
+                if len(chunk) < need:
+                    eof = True
+                window += chunk
+
+            # A trailing separator can drain the window exactly at EOF;
+            # don't emit an empty part for it
+            if eof and not window:
+                break
+
+            if eof and len(window) <= batch_size:
+                # Everything left fits in one final part
+                boundary = len(window)
+            else:
+                boundary = window.rfind(b'\n\n', 0, batch_size + 2)
+                if boundary <= 0:
+                    # No boundary inside the window: grow until the
+                    # oversized paragraph ends or the file does
+                    search_from = batch_size
+                    while True:
+                        idx = window.find(b'\n\n', search_from)
+                        if idx != -1:
+                            boundary = idx
+                            break
+                        if eof:
+                            boundary = len(window)
+                            break
+                        search_from = max(len(window) - 1, batch_size)
+                        chunk = infile.read(1<<20)
+                        if not chunk:
+                            eof = True
+                        window += chunk
+
+            output_file = output_dir / f"{output_prefix}_part{current_part:03d}.txt"
+            write_part(output_file, bytes(window[:boundary]))
+            print(f"Created: {output_file} ({human_readable_size(boundary)})")
+            yield (output_file, boundary)
+
+            current_part += 1
+            del window[:boundary + 2]
+            if eof and not window:
+                break
+
+def write_parts(mm, parts):
+    """
+    Write each (path, start, end) part as one slice of the mapping.
+    The exact size is known up front, so the extents are reserved with
+    posix_fallocate before writing: one metadata update per part instead of
+    one per block, and contiguous on-disk layout for whoever reads it next.
+    """
+    can_fallocate = hasattr(os, 'posix_fallocate')
+    view = memoryview(mm)
+    for output_file, start, end in parts:
+        fd = os.open(output_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            if can_fallocate and end > start:
+                os.posix_fallocate(fd, 0, end - start)
+            part = view[start:end]
+            while part:
+                n = os.write(fd, part)
+                part = part[n:]
+        finally:
+            os.close(fd)
+
+def write_parts_uring(mm, parts):
+    """
+    Write all parts through a single io_uring, submitting in batches of 64.
+    The write SQEs point straight at the mmap (zero copy); opens and closes
+    stay synchronous since each write SQE needs the fd up front. The mapping
+    is deliberately NOT registered as a fixed buffer: registration pins
+    pages with FOLL_WRITE, which a read-only shared file mapping can never
+    satisfy, so io_uring_register_buffers on it always fails with EFAULT.
+    Raises ImportError when liburing isn't installed.
+    """
+    import liburing
+
+    ring = liburing.io_uring()
+    liburing.io_uring_queue_init(256, ring, 0)
+    cqe = liburing.io_uring_cqe()
+    view = memoryview(mm)
+    fds = []
+    tag = 0
+    expected = {}  # sqe user_data tag -> requested write length
+
+    def drain():
+        liburing.io_uring_submit(ring)
+        while expected:
+            liburing.io_uring_wait_cqe(ring, cqe)
+            if cqe.res < 0:
+                raise OSError(-cqe.res, os.strerror(-cqe.res))
+            # A non-negative res smaller than the request is a short write;
+            # surface it so the caller falls back to the sequential writer,
+            # which recreates every part, rather than truncating silently
+            want = expected.pop(cqe.user_data)
+            if cqe.res < want:
+                raise OSError(f"short io_uring write: {cqe.res} of {want} bytes")
+            liburing.io_uring_cqe_seen(ring, cqe)
+        while fds:
+            os.close(fds.pop())
+
+    try:
+        for output_file, start, end in parts:
+            fd = os.open(output_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            fds.append(fd)
+            sqe = liburing.io_uring_get_sqe(ring)
+            liburing.io_uring_prep_write(sqe, fd, view[start:end], end - start, 0)
+            sqe.user_data = tag
+            expected[tag] = end - start
+            tag += 1
+            if len(expected) == 64:
+                drain()
+        drain()
+    finally:
+        while fds:
+            os.close(fds.pop())
+        liburing.io_uring_queue_exit(ring)
 
-def split_file(input_file, batch_size, output_dir=None, output_prefix=None):
+def split_file(input_file, batch_size, output_dir=None, output_prefix=None, use_uring=False,
+               stream=False):
     """
     Split a large text file into multiple files of approximately batch_size,
     ensuring splits occur at paragraph boundaries (line breaks).
+    Yields (output_file, size) for each part as it becomes available, so
+    callers can consume parts without holding the full list in memory.
     """
     input_path = Path(input_file)
     
@@ -56,77 +235,73 @@ def split_file(input_file, batch_size, output_dir=None, output_prefix=None):
     # Get input file size
     total_size = get_file_size(input_path)
     
-    # Calculate number of parts
-    num_parts = math.ceil(total_size / batch_size)
+    # Calculate number of parts (ceiling division, no float round-trip)
+    num_parts = -(-total_size // batch_size)
     print(f"Input file: {input_path} ({human_readable_size(total_size)})")
     print(f"Target batch size: {human_readable_size(batch_size)}")
     print(f"Splitting into approximately {num_parts} parts...")
     
-    # Read file in binary mode to avoid encoding issues when seeking
-    with open(input_path, 'rb') as infile:
-        content = infile.read()
-    
-    # Decode the content (try UTF-8 first, fallback to latin-1)
+    if total_size == 0:
+        print("Input file is empty, nothing to split")
+        return
+
+    if stream:
+        yield from split_file_streaming(input_path, batch_size, output_dir, output_prefix)
+        return
+
+    # mmap the file instead of read()+decode: the kernel pages content in on
+    # demand and can evict it again, so peak memory stays flat even for
+    # multi-GB inputs. All scanning happens on raw bytes, never decoded text.
+    fd = os.open(input_path, os.O_RDONLY)
     try:
-        text_content = content.decode('utf-8')
-    except UnicodeDecodeError:
-        text_content = content.decode('latin-1')
-        print("Note: File decoded using latin-1 encoding (UTF-8 failed)")
-    
-    # Split content into paragraphs (defined by line breaks)
-    paragraphs = text_content.split('\n\n')
-    
-    # Initialize variables for splitting
-    current_part = 1
-    current_size = 0
-    current_content = []
-    output_files = []
-    
-    # Process each paragraph
-    for paragraph in paragraphs:
-        # Add a double newline if this isn't the first paragraph in the current batch
-        if current_content:
-            paragraph_with_break = '\n\n' + paragraph
-            paragraph_size = len(paragraph_with_break.encode('utf-8'))
-        else:
-            paragraph_size = len(paragraph.encode('utf-8'))
-        
-        # If adding this paragraph would exceed batch size and we already have content,
-        # write the current batch and start a new one
-        if current_content and current_size + paragraph_size > batch_size:
-            # Create output file name with padding for proper sorting
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        mm = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+    finally:
+        os.close(fd)
+
+    # Default readahead for a mapping is conservative (~128 KiB); tell the
+    # kernel this is one linear pass so it reads further ahead and drops
+    # consumed pages, and pre-fault the first 64 MiB to hide initial latency
+    if hasattr(mmap, 'MADV_SEQUENTIAL'):
+        mm.madvise(mmap.MADV_SEQUENTIAL)
+        mm.madvise(mmap.MADV_WILLNEED, 0, min(len(mm), 64<<20))
+
+    if use_uring:
+        # io_uring genuinely needs the whole plan up front to batch its
+        # submissions, so only this path materializes the part list.
+        # io_uring can also be missing (no liburing) or refused at runtime
+        # (seccomp EPERM in containers, kernel.io_uring_disabled, ENOSYS on
+        # old kernels), so treat the flag as a hint and degrade to
+        # sequential writes; write_parts rewrites every part from scratch,
+        # so a mid-run failure leaves nothing half-finished.
+        parts = []
+        for current_part, (start, end) in enumerate(plan_parts(mm, batch_size), 1):
             output_file = output_dir / f"{output_prefix}_part{current_part:03d}.txt"
-            
-            # Write the content
-            with open(output_file, 'w', encoding='utf-8') as outfile:
-                outfile.write('\n\n'.join(current_content))
-            
-            output_files.append((output_file, current_size))
-            print(f"Created: {output_file} ({human_readable_size(current_size)})")
-            
-            # Start new batch
-            current_part += 1
-            current_size = paragraph_size
-            current_content = [paragraph]
-        else:
-            # Add paragraph to current batch
-            if current_content:
-                current_size += paragraph_size
-                current_content.append(paragraph)
-            else:
-                current_size = paragraph_size
-                current_content = [paragraph]
-    
-    # Write the last batch if there's anything left
-    if current_content:
-        output_file = output_dir / f"{output_prefix}_part{current_part:03d}.txt"
-        with open(output_file, 'w', encoding='utf-8') as outfile:
-            outfile.write('\n\n'.join(current_content))
-        
-        output_files.append((output_file, current_size))
-        print(f"Created: {output_file} ({human_readable_size(current_size)})")
-    
-    return output_files
+            parts.append((output_file, start, end))
+
+        try:
+            write_parts_uring(mm, parts)
+        except (ImportError, OSError) as e:
+            print(f"Note: io_uring unavailable ({e}), using sequential writes")
+            write_parts(mm, parts)
+
+        for output_file, start, end in parts:
+            print(f"Created: {output_file} ({human_readable_size(end - start)})")
+            yield (output_file, end - start)
+    else:
+        # Write and yield each part as soon as its range is planned: no
+        # part records accumulate, and consumers see each part the moment
+        # it is on disk
+        view = memoryview(mm)
+        for current_part, (start, end) in enumerate(plan_parts(mm, batch_size), 1):
+            output_file = output_dir / f"{output_prefix}_part{current_part:03d}.txt"
+            write_part(output_file, view[start:end])
+            print(f"Created: {output_file} ({human_readable_size(end - start)})")
+            yield (output_file, end - start)
+        view.release()
+
+    mm.close()
 
 def main():
     parser = argparse.ArgumentParser(description='Split a large text file into multiple files at paragraph boundaries.')
@@ -134,7 +309,11 @@ def main():
     parser.add_argument('batch_size', help='Target size for each output file (e.g., "10MB", "500KB")')
     parser.add_argument('-o', '--output-dir', help='Output directory (default: same as input file)')
     parser.add_argument('-p', '--prefix', help='Prefix for output files (default: input filename without extension)')
-    
+    parser.add_argument('--use-uring', action='store_true',
+                        help='Batch part writes through io_uring (Linux, requires liburing)')
+    parser.add_argument('--streaming', action='store_true',
+                        help='Use a constant-memory rolling window instead of mmap')
+
     args = parser.parse_args()
     
     # Convert batch size to bytes
@@ -144,8 +323,15 @@ def main():
         print(f"Error: {e}")
         return 1
     
-    # Split the file
-    split_file(args.input_file, batch_size_bytes, args.output_dir, args.prefix)
+    # Streaming writes each part as it reads, so there is no planned batch
+    # of writes for io_uring to submit
+    if args.streaming and args.use_uring:
+        print("Note: --streaming writes parts as it reads, ignoring --use-uring")
+
+    # Split the file, draining the generator so every part gets written
+    for _ in split_file(args.input_file, batch_size_bytes, args.output_dir, args.prefix,
+                        use_uring=args.use_uring, stream=args.streaming):
+        pass
     return 0
 
 if __name__ == "__main__":